@@ -1,20 +1,54 @@
+from __future__ import annotations
 import os
 import subprocess
 import time
 from pathlib import Path
 import logging
+import logging.handlers
 import argparse
 import platform
 import shutil
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import signal
 import sys
 import json
 import re
-import shlex
-import difflib
-from mutagen import File
+import string
+import queue
+import threading
+import sqlite3
+from contextlib import closing
+from collections import deque
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from mutagen import MutagenError
+from mutagen.id3 import ID3, ID3NoHeaderError, TDAT, TDOR, TDRC, TIME, TORY, TYER
+from mutagen.mp3 import MP3
+from mutagen.mp4 import MP4
 from datetime import datetime
+from typing import TextIO
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
+if platform.system() == 'Linux':
+    from watchdog.observers.inotify import InotifyObserver
+from watchdog.events import FileSystemEventHandler
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+
+class BufferedLogHandler(logging.handlers.MemoryHandler):
+    # Batches writes, but a background flush every LOG_FLUSH_INTERVAL means a watcher that goes
+    # quiet, or dies to SIGKILL/the OOM killer mid-decode, loses at most a few seconds of log
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        threading.Thread(target=self._flush_loop, daemon=True).start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(LOG_FLUSH_INTERVAL)
+            self.flush()
 
 # Set up logging
 def setup_logging():
@@ -22,61 +56,187 @@ def setup_logging():
     log_dir = home / "logs" / "AutoTranscribe"
     log_dir.mkdir(parents=True, exist_ok=True)
     log_file = log_dir / "autotranscribe.log"
-    logging.basicConfig(filename=str(log_file), level=logging.DEBUG,
-                        format='%(asctime)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler(str(log_file))
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    # Records are written in batches rather than one write per line; warnings and errors flush
+    # immediately, each finished file flushes, and logging.shutdown() flushes the rest at exit
+    memory_handler = BufferedLogHandler(LOG_BUFFER_CAPACITY, flushLevel=logging.WARNING, target=file_handler)
+    logging.basicConfig(level=logging.DEBUG, handlers=[memory_handler])
 
 # Define constants
+LOG_BUFFER_CAPACITY = 512  # Log records buffered before they are written out
+LOG_FLUSH_INTERVAL = 5  # Seconds a buffered log record may wait for the next flush
 MEDIA_EXTENSIONS = ('.mp3', '.wav', '.mp4', '.m4a')
+TRANSCRIPT_EXTENSIONS = ('.txt', '.srt')
+SCAN_EXTENSIONS = MEDIA_EXTENSIONS + TRANSCRIPT_EXTENSIONS  # Everything else is dropped on sight while scanning
 LOCK_DIR = Path(os.getenv('TEMP', '/tmp')) / "transcription_locks"
 DEFAULT_MONITOR_DIR = Path("/mnt/e/AV/Capture")  # Adjust this path as needed
 PENDING_DIR = DEFAULT_MONITOR_DIR
 MAX_RETRIES = 3
+RETRY_FAILED = False  # Set by --retry_failed; otherwise unchanged files that failed before are skipped
+RETRY_BACKOFF_BASE = 2  # Seconds; doubles after every failed attempt
+ADMISSION_WINDOW = 4  # Completed jobs averaged when adjusting concurrency
+ADMISSION_OVERLOAD = 1.5  # Load average per core above which fewer files run at once
+ADMISSION_UNDERLOAD = 0.8  # Load average per core below which more files may run again
 LANGUAGE_MODE = "en"
 MAX_CONCURRENT_PROCESSES = 2
-WHISPER_TIMEOUT = 14400  # 4 hours timeout for Whisper
+WHISPER_MODEL = "large-v2"
+WHISPER_DEVICE = "auto"
+WHISPER_COMPUTE_TYPE = "int8"
+WHISPER_BATCH_SIZE = 16  # VAD speech segments decoded together per batch
+WHISPER_BEAM_SIZE = 1  # Greedy decoding
 MAX_DURATION = 14400  # 4 hours maximum duration for processing
 TEMP_DIR = Path(os.getenv('TEMP', '/tmp')) / "transcription_chunks"
+TRANSCRIPT_BUFFER_SIZE = 1 << 20  # 1 MiB write buffer for streamed transcript segments
+CHUNK_DURATION = 600  # Files longer than this many seconds are transcribed in chunks of this length
+PROBE_CACHE_FILE = LOCK_DIR / "probe_cache.json"
+STATE_DB = LOCK_DIR / "state.sqlite"  # Files that failed, keyed by absolute path
 SKIP_DIR_NAME = "unable_to_repair_corrupt"
+REPAIRED_SUFFIX = "_repaired"
+POLLING_INTERVAL = 60  # Seconds between scans when inotify is unavailable
+SETTLE_INTERVAL = 10  # Seconds a new file's size and mtime must hold still before it is queued (no close events)
+NETWORK_FS_TYPES = ('nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', '9p', 'drvfs', 'fuse.sshfs')
+# Resolved once so each subprocess skips the $PATH walk (long on WSL)
+FFMPEG_BIN = shutil.which("ffmpeg") or "ffmpeg"
+FFPROBE_BIN = shutil.which("ffprobe") or "ffprobe"
+# Fixed command prefixes; callers only append per-file arguments
+FFPROBE_CMD = (FFPROBE_BIN, '-hide_banner', '-v', 'error', '-select_streams', 'a:0', '-show_entries',
+               'format=duration:stream=codec_name', '-of', 'default=noprint_wrappers=1')
+ID3_DATE_FRAMES = {'TDRC': TDRC, 'TDOR': TDOR, 'TYER': TYER, 'TDAT': TDAT, 'TIME': TIME, 'TORY': TORY}
+STREAM_COPY_CODECS = {'aac': '.m4a', 'mp3': '.mp3'}  # Audio codecs Whisper reads without conversion
+# mutagen reports MP4 audio as an RFC 6381 codec string; map the ones Whisper reads to ffprobe names
+MP4_CODEC_NAMES = {'mp4a.40.2': 'aac', 'mp4a.40.5': 'aac', 'mp4a.40.29': 'aac', 'mp4a.69': 'mp3', 'mp4a.6b': 'mp3'}
+# Only errors reach stderr, which is all callers capture; ffmpeg writes nothing useful to stdout
+FFMPEG_CMD = (FFMPEG_BIN, '-nostdin', '-y', '-hide_banner', '-loglevel', 'error', '-nostats')
+WORD_PATTERN = re.compile(r'\S+')
+SAFE_NAME_CHARS = frozenset(string.ascii_letters + string.digits + '_.-')
+ROLLING_HASH_BASE = 1_000_003
+ROLLING_HASH_MOD = (1 << 61) - 1  # Mersenne prime; collisions are negligible at transcript sizes
 
-def sanitize_name(name: str) -> str:
-    return re.sub(r'[^a-zA-Z0-9_.-]', '_', name)
+MODEL = None  # Loaded once in main() and shared by all workers
+PROBE_CACHE = {}  # Absolute path -> [st_mtime_ns, st_size, duration, codec], persisted to PROBE_CACHE_FILE
+PROBE_CACHE_LOCK = threading.Lock()
+ADMISSION_GATE = None  # Created in main() once the worker count is known
+STOP_EVENT = threading.Event()  # Set on SIGINT/SIGTERM; running transcriptions stop at the next segment
+
+class SanitizeTable(dict):
+    # str.translate table that fills itself in: any code point outside SAFE_NAME_CHARS maps to '_'
+    def __missing__(self, codepoint: int) -> str:
+        char = chr(codepoint)
+        replacement = char if char in SAFE_NAME_CHARS else '_'
+        self[codepoint] = replacement
+        return replacement
 
-def escape_path(path: Path) -> str:
-    return shlex.quote(str(path))
+SANITIZE_TABLE = SanitizeTable()
+
+def sanitize_name(name: str) -> str:
+    return name.translate(SANITIZE_TABLE)
 
 def rename_file(file_path: Path) -> Path:
     new_filename = sanitize_name(file_path.name)
     new_file_path = file_path.parent / new_filename
     if file_path != new_file_path:
         try:
-            new_file_path.parent.mkdir(parents=True, exist_ok=True)
-            shutil.move(str(file_path), str(new_file_path))
+            # Same directory, so a plain rename(2); never a copy of the whole recording
+            file_path.replace(new_file_path)
             logging.info(f"Renamed {file_path} to {new_file_path}")
         except Exception as e:
             logging.error(f"Error renaming {file_path}: {str(e)}")
     return new_file_path
 
-def find_pending_files(recursive: bool = False, monitor_dir: Path = None) -> list[Path]:
-    pattern = "**/*" if recursive else "*"
+def init_state_db() -> None:
+    LOCK_DIR.mkdir(parents=True, exist_ok=True)
+    with closing(sqlite3.connect(STATE_DB, timeout=30)) as conn, conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime REAL, status TEXT)")
+
+def record_status(file_path: Path, status: str) -> None:
+    try:
+        with closing(sqlite3.connect(STATE_DB, timeout=30)) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO files (path, mtime, status) VALUES (?, ?, ?)",
+                         (os.path.abspath(file_path), file_path.stat().st_mtime, status))
+    except (sqlite3.Error, OSError) as e:
+        logging.warning(f"Unable to record status of {file_path}: {str(e)}")
+
+def mark_failed(*file_paths: Path) -> None:
+    for file_path in set(file_paths):
+        record_status(file_path, 'failed')
+
+def clear_failed(*file_paths: Path) -> None:
+    try:
+        with closing(sqlite3.connect(STATE_DB, timeout=30)) as conn, conn:
+            conn.executemany("DELETE FROM files WHERE path = ?",
+                             [(os.path.abspath(file_path),) for file_path in set(file_paths)])
+    except sqlite3.Error as e:
+        logging.warning(f"Unable to update {STATE_DB}: {str(e)}")
+
+def failed_before(file_path: Path) -> bool:
+    # Same test as find_pending_files, for jobs that come from watch events instead of the scan
+    try:
+        with closing(sqlite3.connect(STATE_DB, timeout=30)) as conn:
+            row = conn.execute("SELECT mtime FROM files WHERE path = ? AND status = 'failed'",
+                               (os.path.abspath(file_path),)).fetchone()
+        return row is not None and row[0] == file_path.stat().st_mtime
+    except (sqlite3.Error, OSError) as e:
+        logging.warning(f"Unable to read {STATE_DB}: {str(e)}")
+        return False
+
+def load_failed_files() -> dict[str, float]:
+    try:
+        with closing(sqlite3.connect(STATE_DB, timeout=30)) as conn:
+            return dict(conn.execute("SELECT path, mtime FROM files WHERE status = 'failed'"))
+    except sqlite3.Error as e:
+        logging.warning(f"Unable to read {STATE_DB}: {str(e)}")
+        return {}
+
+def find_pending_files(recursive: bool = False, monitor_dir: Path = None, retry_failed: bool = False) -> list[Path]:
     monitor_dir = Path(monitor_dir) if monitor_dir else PENDING_DIR
-    files_found = list(monitor_dir.glob(pattern))
-    if recursive:
-        files_found = [f for f in files_found if SKIP_DIR_NAME not in f.parts]
-    pending_files = []
-    for f in files_found:
-        if f.suffix.lower() in MEDIA_EXTENSIONS:
-            txt_exists = f.with_suffix('.txt').exists()
-            srt_exists = f.with_suffix('.srt').exists()
-            if not (txt_exists or srt_exists):
-                pending_files.append(f)
-            else:
+    # Files that already failed are only retried once they change (or with --retry_failed)
+    failed_files = {} if retry_failed else load_failed_files()
+    candidates = []
+    directories = [monitor_dir]
+    while directories:
+        directory = directories.pop()
+        # One directory read per folder; transcripts are matched by stem instead of stat'ing siblings
+        media_files = []
+        transcribed = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):  # Symlinked directories can loop back up the tree
+                        if recursive and entry.name != SKIP_DIR_NAME:
+                            directories.append(Path(entry.path))
+                        continue
+                    # One C-level suffix check rejects unrelated files before any splitting
+                    if not entry.name.lower().endswith(SCAN_EXTENSIONS):
+                        continue
+                    stem, suffix = os.path.splitext(entry.name)
+                    if suffix.lower() in MEDIA_EXTENSIONS:
+                        media_files.append((entry, stem))
+                    else:
+                        transcribed.add(stem)
+        except OSError as e:
+            logging.error(f"Error scanning {directory}: {str(e)}")
+            continue
+        for entry, stem in media_files:
+            f = directory / entry.name
+            if stem in transcribed:
                 logging.info(f"Skipping {f} as transcription file already exists.")
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue  # Removed since the directory was read
+            if failed_files.get(os.path.abspath(f)) == mtime:
+                logging.info(f"Skipping {f} as it failed before and has not changed.")
+            else:
+                candidates.append((mtime, f))
+    # Newest recordings first
+    pending_files = [f for _, f in sorted(candidates, key=lambda c: c[0], reverse=True)]
     logging.info(f"Found {len(pending_files)} media files pending transcription.")
     if not pending_files:
         logging.info("No pending files found. Double check the directory and file extensions.")
     else:
-        for file in pending_files:
-            logging.info(f"Pending file: {file}")
+        logging.info("Pending files:\n%s", "\n".join(map(str, pending_files)))
     return pending_files
 
 def display_queue(pending_files: list[Path]) -> None:
@@ -85,56 +245,284 @@ def display_queue(pending_files: list[Path]) -> None:
         print(f" - {file}")
     print(f"Total files pending: {len(pending_files)}")
 
-def is_valid_media_file(file_path: Path) -> bool:
+def has_transcript(file_path: Path) -> bool:
+    return file_path.with_suffix('.txt').exists() or file_path.with_suffix('.srt').exists()
+
+# inotify does not see changes made by other hosts on network/WSL-mounted filesystems
+def is_network_mount(path: Path) -> bool:
+    resolved = str(path.resolve())
+    best_match, fs_type = "", ""
     try:
-        cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', escape_path(file_path)]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        if result.returncode != 0:
-            logging.error(f"FFprobe failed for {file_path}: {result.stderr}")
-            return False
-        probe_data = json.loads(result.stdout)
-        duration = probe_data.get('format', {}).get('duration', 0)
-        if duration is None:
-            logging.error(f"FFprobe output for {file_path} does not contain duration")
-            return False
-        logging.info(f"File {file_path} duration: {duration} seconds")
-        return 0 < float(duration) <= MAX_DURATION
+        with open('/proc/mounts') as mounts:
+            for line in mounts:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace('\\040', ' ')
+                in_mount = resolved == mount_point or resolved.startswith(mount_point.rstrip('/') + '/')
+                if in_mount and len(mount_point) > len(best_match):
+                    best_match, fs_type = mount_point, fields[2]
+    except OSError:
+        return False
+    return fs_type in NETWORK_FS_TYPES
+
+def is_watched_media(path: Path) -> bool:
+    if path.suffix.lower() not in MEDIA_EXTENSIONS or path.stem.endswith(REPAIRED_SUFFIX):
+        return False
+    return SKIP_DIR_NAME not in path.parts
+
+class PendingFileHandler(FileSystemEventHandler):
+    def __init__(self, file_queue: queue.Queue, wait_for_close: bool, recursive: bool):
+        super().__init__()
+        self.file_queue = file_queue
+        self.wait_for_close = wait_for_close
+        self.recursive = recursive
+        # Without close events a file shows up while it is still being copied or recorded, so
+        # it is only queued once its size and mtime stop changing
+        self.settling = {}  # Path -> (st_size, st_mtime_ns) at the last check, None if not yet checked
+        self.settling_lock = threading.Lock()
+        if not wait_for_close:
+            threading.Thread(target=self._settle_loop, daemon=True).start()
+
+    def _enqueue(self, src_path: str) -> None:
+        path = Path(src_path)
+        if not is_watched_media(path):
+            return
+        logging.info(f"Detected new media file: {path}")
+        self.file_queue.put(path)
+
+    def _track(self, src_path: str) -> None:
+        path = Path(src_path)
+        if is_watched_media(path):
+            with self.settling_lock:
+                self.settling[path] = None
+
+    def _settle_loop(self) -> None:
+        while True:
+            time.sleep(SETTLE_INTERVAL)
+            settled = []
+            with self.settling_lock:
+                for path, last_seen in list(self.settling.items()):
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        del self.settling[path]  # Removed or renamed away before it settled
+                        continue
+                    current = (stat.st_size, stat.st_mtime_ns)
+                    if current == last_seen:
+                        del self.settling[path]
+                        settled.append(path)
+                    else:
+                        self.settling[path] = current
+            for path in settled:
+                self._enqueue(str(path))
+
+    def on_created(self, event) -> None:
+        # With inotify we wait for the writer to close the file instead
+        if not event.is_directory and not self.wait_for_close:
+            self._track(event.src_path)
+
+    def on_modified(self, event) -> None:
+        # Also picks up a file that failed while incomplete once it is written again
+        if not event.is_directory and not self.wait_for_close:
+            self._track(event.src_path)
+
+    def on_closed(self, event) -> None:
+        if not event.is_directory:
+            self._enqueue(event.src_path)
+
+    def on_moved(self, event) -> None:
+        # Downloaders and recorders often write to a temp name and rename when done, and files
+        # moved in from outside the tree arrive with an empty (older watchdog: None) src_path. Renames between media
+        # names are our own (sanitizing, repair) and the original is already queued
+        if not event.dest_path:
+            return  # Moved out of the watched tree
+        if event.is_directory:
+            # The directory's contents only show up as created events, which are ignored while
+            # waiting for close, so scan it instead
+            if self.recursive and SKIP_DIR_NAME not in Path(event.dest_path).parts:
+                for path in find_pending_files(recursive=True, monitor_dir=Path(event.dest_path)):
+                    self._enqueue(str(path))
+        elif not event.src_path or Path(event.src_path).suffix.lower() not in MEDIA_EXTENSIONS:
+            self._enqueue(event.dest_path)
+
+def start_observer(monitor_dir: Path, recursive: bool, file_queue: queue.Queue):
+    if is_network_mount(monitor_dir):
+        logging.info(f"{monitor_dir} is on a network mount, polling every {POLLING_INTERVAL}s")
+        observer = PollingObserver(timeout=POLLING_INTERVAL)
+        wait_for_close = False
+    elif platform.system() == 'Linux':
+        # Without full events, a file moved in from elsewhere on the same filesystem is reported
+        # as created, with no close to follow; full events report it as moved from ''
+        observer = InotifyObserver(generate_full_events=True)
+        wait_for_close = True
+    else:
+        observer = Observer()
+        wait_for_close = False
+    handler = PendingFileHandler(file_queue, wait_for_close, recursive)
+    observer.schedule(handler, str(monitor_dir), recursive=recursive)
+    observer.start()
+    return observer
+
+def load_probe_cache() -> None:
+    try:
+        with open(PROBE_CACHE_FILE) as f:
+            PROBE_CACHE.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"Ignoring unreadable probe cache {PROBE_CACHE_FILE}: {str(e)}")
+
+def save_probe_cache() -> None:
+    tmp_file = PROBE_CACHE_FILE.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        LOCK_DIR.mkdir(parents=True, exist_ok=True)
+        with PROBE_CACHE_LOCK:
+            with open(tmp_file, 'w') as f:
+                json.dump(PROBE_CACHE, f)
+            os.replace(tmp_file, PROBE_CACHE_FILE)
+    except OSError as e:
+        logging.warning(f"Unable to save probe cache: {str(e)}")
+
+def read_media_header(file_path: Path) -> tuple[float, str | None] | None:
+    # The MP4 mvhd atom and the MP3 frame/Xing headers hold the duration, so most files
+    # need no ffprobe process at all; anything unusual falls through to ffprobe
+    suffix = file_path.suffix.lower()
+    try:
+        if suffix == '.mp3':
+            info = MP3(str(file_path)).info
+            codec = 'mp3'
+        elif suffix in ('.mp4', '.m4a'):
+            info = MP4(str(file_path)).info
+            codec = MP4_CODEC_NAMES.get(info.codec.lower(), info.codec)
+        else:
+            return None
+    except MutagenError:
+        return None
+    if info.length <= 0:
+        return None
+    return info.length, codec
+
+def run_ffprobe(file_path: Path) -> tuple[float, str | None] | None:
+    cmd = FFPROBE_CMD + (str(file_path),)
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    if result.returncode != 0:
+        logging.error(f"FFprobe failed for {file_path}: {result.stderr}")
+        return None
+    fields = dict(line.split('=', 1) for line in result.stdout.splitlines() if '=' in line)
+    if not fields.get('duration'):
+        logging.error(f"FFprobe output for {file_path} does not contain duration")
+        return None
+    return float(fields['duration']), fields.get('codec_name')
+
+def probe_media(file_path: Path, save: bool = True) -> tuple[float, str | None] | None:
+    # Returns (duration in seconds, codec of the first audio stream)
+    try:
+        stat = file_path.stat()
+        cache_key = os.path.abspath(file_path)
+        cached = PROBE_CACHE.get(cache_key)
+        if cached and len(cached) == 4 and cached[:2] == [stat.st_mtime_ns, stat.st_size]:
+            return cached[2], cached[3]
+        probe = read_media_header(file_path) or run_ffprobe(file_path)
+        if probe is None:
+            return None
+        duration, codec = probe
+        with PROBE_CACHE_LOCK:
+            PROBE_CACHE[cache_key] = [stat.st_mtime_ns, stat.st_size, duration, codec]
+        if save:
+            save_probe_cache()
+        return duration, codec
     except subprocess.TimeoutExpired:
         logging.error(f"Timeout checking file integrity: {file_path}")
-    except (ValueError, KeyError, json.JSONDecodeError) as e:
+    except ValueError as e:
         logging.error(f"Error parsing FFprobe output for {file_path}: {str(e)}")
     except Exception as e:
         logging.error(f"Unexpected error checking file integrity: {file_path} - {str(e)}")
-    return False
+    return None
+
+def is_valid_media_file(file_path: Path) -> bool:
+    probe = probe_media(file_path)
+    if probe is None:
+        return False
+    duration = probe[0]
+    logging.info(f"File {file_path} duration: {duration} seconds")
+    return 0 < duration <= MAX_DURATION
 
-def convert_to_audio(input_file: Path, output_file: Path) -> bool:
-    ffmpeg_cmd = [
-        "ffmpeg", "-nostdin", "-y", "-i", escape_path(input_file), "-vn", "-ar", "44100",
-        "-ac", "2", "-b:a", "192k", "-threads", "1", escape_path(output_file)
-    ]
+def prefetch_probe(file_path: Path) -> Path:
+    # Probe under the sanitized name process_file will use, so its lookup hits the cache
+    file_path = rename_file(file_path)
+    probe_media(file_path, save=False)
+    return file_path
+
+def probe_pending_files(pending_files: list[Path]) -> list[Path]:
+    # ffprobe only reads container headers, so all cores can probe while the Whisper pool stays small
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as probe_pool:
+        pending_files = list(probe_pool.map(prefetch_probe, pending_files))
+    save_probe_cache()
+    return pending_files
+
+def convert_to_audio(input_file: Path) -> Path | None:
+    probe = probe_media(input_file)
+    copy_suffix = STREAM_COPY_CODECS.get(probe[1]) if probe else None
+    if copy_suffix == input_file.suffix.lower():
+        logging.info(f"Using {input_file} directly, its audio needs no conversion")
+        return input_file
+    if copy_suffix:
+        # Whisper decodes AAC/MP3 itself, so just lift the audio track out without re-encoding
+        output_file = input_file.with_suffix(copy_suffix)
+        codec_args = ("-map", "0:a:0", "-c:a", "copy")
+    else:
+        # 16 kHz mono PCM is what Whisper resamples to anyway, so skip the MP3 encoder entirely
+        output_file = input_file.with_suffix('.wav')
+        codec_args = ("-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le")
+    ffmpeg_cmd = FFMPEG_CMD + ("-i", str(input_file), "-vn") + codec_args + (str(output_file),)
     try:
-        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True, timeout=3600)
+        subprocess.run(ffmpeg_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+                       timeout=3600)
         logging.info(f"Successfully converted {input_file} to audio")
-        return True
+        return output_file
     except subprocess.CalledProcessError as e:
         logging.error(f"FFmpeg conversion failed for {input_file}: {e.stderr}")
     except subprocess.TimeoutExpired:
         logging.error(f"FFmpeg conversion timed out for {input_file}")
-    return False
+    return None
+
+def split_audio(file_path: Path, chunk_duration: int = CHUNK_DURATION) -> list[Path]:
+    TEMP_DIR.mkdir(parents=True, exist_ok=True)
+    chunk_glob = f"{file_path.stem}_chunk_*{file_path.suffix}"
+    for stale_chunk in TEMP_DIR.glob(chunk_glob):
+        stale_chunk.unlink(missing_ok=True)
+    # Stream copy: ffmpeg cuts on packet boundaries without decoding or re-encoding
+    segment_cmd = FFMPEG_CMD + (
+        # Only the audio track; cover art in MP3/M4A would otherwise be copied into every segment
+        "-i", str(file_path), "-map", "0:a:0", "-vn", "-f", "segment", "-segment_time", str(chunk_duration),
+        "-reset_timestamps", "1", "-c", "copy",
+        str(TEMP_DIR / f"{file_path.stem}_chunk_%03d{file_path.suffix}")
+    )
+    try:
+        subprocess.run(segment_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+                       timeout=3600)
+        chunks = sorted(TEMP_DIR.glob(chunk_glob))
+        logging.info(f"Split {file_path} into {len(chunks)} chunks")
+        return chunks
+    except subprocess.CalledProcessError as e:
+        logging.error(f"FFmpeg segmentation failed for {file_path}: {e.stderr}")
+    except subprocess.TimeoutExpired:
+        logging.error(f"FFmpeg segmentation timed out for {file_path}")
+    return []
 
 def attempt_repair(input_file: Path) -> bool:
-    repaired_file = input_file.with_name(f"{input_file.stem}_repaired{input_file.suffix}")
+    repaired_file = input_file.with_name(f"{input_file.stem}{REPAIRED_SUFFIX}{input_file.suffix}")
     if repaired_file.exists():
         logging.info(f"Overwriting existing repaired file: {repaired_file}")
         repaired_file.unlink(missing_ok=True)
-    repair_cmd = [
-        "ffmpeg", "-i", escape_path(input_file), "-c", "copy", escape_path(repaired_file)
-    ]
+    repair_cmd = FFMPEG_CMD + ("-i", str(input_file), "-c", "copy", str(repaired_file))
     try:
-        result = subprocess.run(repair_cmd, capture_output=True, text=True, check=True, timeout=1800)
+        subprocess.run(repair_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+                       timeout=1800)
         logging.info(f"Attempted repair of {input_file}")
         if is_valid_media_file(repaired_file):
-            shutil.move(str(repaired_file), str(input_file))
+            repaired_file.replace(input_file)
             logging.info(f"Successfully repaired and replaced {input_file}")
             return True
         else:
@@ -150,135 +538,397 @@ def attempt_repair(input_file: Path) -> bool:
         repaired_file.unlink(missing_ok=True)
         return False
 
-def check_repetition(text: str, threshold: float = 0.9, window_size: int = 100) -> bool:
-    words = text.split()
-    if len(words) < window_size * 2:
+class RepetitiveOutputError(Exception):
+    pass
+
+class TranscriptionStopped(Exception):
+    pass
+
+def raise_if_stopping(file_path: Path) -> None:
+    # A terminal Ctrl+C or a service stop also kills our ffmpeg children, so a step that failed
+    # during shutdown says nothing about the file and must not mark it failed
+    if STOP_EVENT.is_set():
+        raise TranscriptionStopped(f"Stopped while processing {file_path}")
+
+class RepetitionDetector:
+    # A decoding loop repeats the same word sequence back to back, so the same short window of words
+    # keeps coming back within a few windows; hashing windows as words stream in catches it without
+    # waiting for the end. Recurrences further apart (a chorus, a repeated ad read) are forgotten
+    def __init__(self, window_size: int = 20, max_repeats: int = 3, max_gap_windows: int = 3):
+        self.window = deque(maxlen=window_size)
+        self.max_repeats = max_repeats
+        self.max_gap = window_size * max_gap_windows  # In words
+        self.position = 0
+        self.last_seen = {}  # Window hash -> (word position, back-to-back occurrences so far)
+        self.recent = deque()  # (word position, window hash) of windows still within max_gap
+        # Rabin-Karp: sliding the window by one word is O(1) instead of rehashing all of it
+        self.rolling_hash = 0
+        self.top_power = pow(ROLLING_HASH_BASE, window_size - 1, ROLLING_HASH_MOD)
+
+    def feed(self, text: str) -> bool:
+        # Words are pulled lazily from the segment instead of splitting it into a list first
+        for match in WORD_PATTERN.finditer(text):
+            word_hash = hash(match.group()) % ROLLING_HASH_MOD
+            if len(self.window) == self.window.maxlen:
+                self.rolling_hash -= self.window[0] * self.top_power
+            self.window.append(word_hash)
+            self.rolling_hash = (self.rolling_hash * ROLLING_HASH_BASE + word_hash) % ROLLING_HASH_MOD
+            self.position += 1
+            if len(self.window) < self.window.maxlen:
+                continue
+            while self.recent and self.position - self.recent[0][0] > self.max_gap:
+                old_position, old_hash = self.recent.popleft()
+                if self.last_seen[old_hash][0] == old_position:
+                    del self.last_seen[old_hash]
+            previous = self.last_seen.get(self.rolling_hash)
+            repeats = previous[1] + 1 if previous else 1
+            if repeats >= self.max_repeats:
+                return True
+            self.last_seen[self.rolling_hash] = (self.position, repeats)
+            self.recent.append((self.position, self.rolling_hash))
         return False
-    for i in range(len(words) - window_size):
-        window1 = ' '.join(words[i:i+window_size])
-        window2 = ' '.join(words[i+window_size:i+window_size*2])
-        similarity = difflib.SequenceMatcher(None, window1, window2).ratio()
-        if similarity > threshold:
-            return True
-    return False
+
+# Advisory locks are dropped by the kernel when the holder exits, so a crash never leaves a stale lock
+def acquire_lock(lock_path: Path) -> int | None:
+    LOCK_DIR.mkdir(parents=True, exist_ok=True)
+    if lock_path.is_dir():
+        lock_path.rmdir()  # Left behind by the old mkdir-based locks
+    while True:
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return None
+        if not fcntl:
+            return fd
+        # The previous holder unlinks the file on release; if that happened between our open
+        # and flock we hold a lock on a dead inode, so start over on the current file
+        try:
+            if os.fstat(fd).st_ino == os.stat(lock_path).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+def release_lock(fd: int, lock_path: Path) -> None:
+    if fcntl:
+        lock_path.unlink(missing_ok=True)  # While still locked, so nobody can grab this inode
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    os.close(fd)
+
+def get_creation_date(file_path: Path) -> str | None:
+    # Extract creation date from MP3 metadata; only the date frames are decoded
+    if file_path.suffix.lower() != '.mp3':
+        return None
+    creation_date = None
+    try:
+        # translate merges ID3v2.3's TYER/TDAT/TIME into TDRC and TORY into TDOR
+        tags = ID3(str(file_path), known_frames=ID3_DATE_FRAMES, load_v1=False)
+        if 'TDRC' in tags:
+            creation_date = str(tags['TDRC'].text[0])
+        elif 'TDOR' in tags:
+            creation_date = str(tags['TDOR'].text[0])
+    except ID3NoHeaderError:
+        return None
+    except Exception as e:
+        logging.warning(f"Error extracting creation date from {file_path}: {str(e)}")
+    if not creation_date:
+        return None
+    try:
+        return datetime.strptime(creation_date, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d')
+    except ValueError:
+        logging.warning(f"Invalid creation date format for {file_path}: {creation_date}")
+        return None
 
 def process_file(file_path: Path) -> None:
+    if not file_path.exists():
+        logging.info(f"Skipping {file_path} as it no longer exists.")
+        return
     file_path = rename_file(file_path)  # Ensure the file is renamed
+    source_file = file_path
     base_name = file_path.with_suffix('')
     lock_file = LOCK_DIR / f"{base_name.name}.lock"
     output_dir = file_path.parent
 
-    if lock_file.exists():
+    lock_fd = acquire_lock(lock_file)
+    if lock_fd is None:
         logging.info(f"Skipping {file_path} as it is currently being processed by another instance.")
         return
 
     try:
-        LOCK_DIR.mkdir(parents=True, exist_ok=True)  # Ensure LOCK_DIR exists
-        lock_file.mkdir(parents=True, exist_ok=False)
         logging.info(f"Lock acquired for {file_path}")
 
+        if has_transcript(file_path):
+            logging.info(f"Skipping {file_path} as transcription file already exists.")
+            return
+
+        if not RETRY_FAILED and failed_before(file_path):
+            logging.info(f"Skipping {file_path} as it failed before and has not changed.")
+            return
+
         if not is_valid_media_file(file_path):
+            raise_if_stopping(file_path)
             if attempt_repair(file_path):
                 logging.info(f"File {file_path} was successfully repaired")
             else:
+                raise_if_stopping(file_path)
                 logging.error(f"Unable to repair {file_path}")
+                mark_failed(file_path)
                 return
 
         if file_path.suffix.lower() in ('.mp4', '.m4a'):
-            audio_file = base_name.with_suffix('.mp3')
-            if not convert_to_audio(file_path, audio_file):
+            audio_file = convert_to_audio(file_path)
+            raise_if_stopping(file_path)
+            if audio_file is None:
+                mark_failed(file_path)
                 return
             file_path = audio_file
 
         if file_path.exists():
             logging.info(f"Transcribing {file_path}")
             try:
-                final_transcription = transcribe_chunk(file_path)
-                if check_repetition(final_transcription):
-                    logging.warning(f"Repetitive output detected for {file_path}. Stopping transcription.")
-                else:
-                    # Extract creation date from MP3 metadata
-                    creation_date = None
-                    try:
-                        audio_file = File(file_path)
-                        if 'TDRC' in audio_file.tags:
-                            creation_date = audio_file.tags['TDRC'].text[0]
-                        elif 'TDOR' in audio_file.tags:
-                            creation_date = audio_file.tags['TDOR'].text[0]
-                    except Exception as e:
-                        logging.warning(f"Error extracting creation date from {file_path}: {str(e)}")
-
-                    # Format the creation date if available
-                    if creation_date:
-                        try:
-                            creation_date = datetime.strptime(creation_date, '%Y-%m-%d %H:%M:%S')
-                            formatted_date = creation_date.strftime('%Y-%m-%d')
-                        except ValueError:
-                            logging.warning(f"Invalid creation date format for {file_path}: {creation_date}")
-                            formatted_date = None
-                    else:
-                        formatted_date = None
-
-                    # Write the transcription to a text file
-                    with open(file_path.with_suffix('.txt'), 'w') as f:
-                        if formatted_date:
-                            f.write(f"Creation Date: {formatted_date}\n\n")
-                        f.write(final_transcription)
+                formatted_date = get_creation_date(file_path)
+                header = f"Creation Date: {formatted_date}\n\n" if formatted_date else ""
+                if transcribe_with_retries(file_path, file_path.with_suffix('.txt'), header):
                     logging.info(f"Transcription completed for {file_path}")
+                    clear_failed(source_file, file_path)  # Only failures are tracked
+                else:
+                    raise_if_stopping(file_path)
+                    logging.error(f"Giving up on {file_path} after {MAX_RETRIES} attempts")
+                    mark_failed(source_file, file_path)
+            except RepetitiveOutputError:
+                logging.warning(f"Repetitive output detected for {file_path}. Stopping transcription.")
+                mark_failed(source_file, file_path)
+            except TranscriptionStopped:
+                raise
             except Exception as e:
                 logging.error(f"Error during transcription of {file_path}: {str(e)}")
         else:
             logging.error(f"File {file_path} not found after conversion.")
 
+    except TranscriptionStopped:
+        logging.info(f"Processing of {file_path} stopped on shutdown")
     finally:
-        if lock_file.exists():
-            lock_file.rmdir()
-            logging.info(f"Lock released for {file_path}")
-
-def transcribe_chunk(file_path: Path) -> str:
-    whisper_cmd = [
-        "whisper", escape_path(file_path), "--model", "large-v2",
-        "--language", LANGUAGE_MODE, "--output_dir", escape_path(file_path.parent)
-    ]
+        release_lock(lock_fd, lock_file)
+        logging.info(f"Lock released for {file_path}")
+
+def load_model() -> BatchedInferencePipeline:
+    global MODEL
+    logging.info(f"Loading Whisper model {WHISPER_MODEL} on {WHISPER_DEVICE} ({WHISPER_COMPUTE_TYPE})")
+    # Split the cores between concurrent files instead of every file grabbing all of them
+    cpu_threads = max(1, (os.cpu_count() or 1) // MAX_CONCURRENT_PROCESSES)
+    # One worker per concurrent file; with the default of one, calls from the pool's threads
+    # queue up behind each other. Workers on the same device share the loaded weights
+    model = WhisperModel(WHISPER_MODEL, device=WHISPER_DEVICE, compute_type=WHISPER_COMPUTE_TYPE,
+                         cpu_threads=cpu_threads, num_workers=MAX_CONCURRENT_PROCESSES)
+    MODEL = BatchedInferencePipeline(model=model)
+    return MODEL
+
+def transcribe_chunk(file_path: Path, detector: RepetitionDetector, out: TextIO) -> None:
+    raise_if_stopping(file_path)  # Whisper decodes the whole chunk's audio before the first segment
+    logging.info(f"Running Whisper on {file_path}")
+    # Silero VAD drops silence before decoding; an all-silent chunk never reaches the model
+    segments, _ = MODEL.transcribe(str(file_path), language=LANGUAGE_MODE, batch_size=WHISPER_BATCH_SIZE,
+                                   vad_filter=True, beam_size=WHISPER_BEAM_SIZE)
+    # Segments are decoded lazily, so bailing out here stops Whisper mid-file
+    for segment in segments:
+        raise_if_stopping(file_path)
+        text = segment.text.strip()
+        if detector.feed(text):
+            raise RepetitiveOutputError(f"Repetitive output detected in {file_path}")
+        if text:
+            out.write(f"{text}\n")
+    logging.info(f"Whisper transcription completed for {file_path}")
+
+def transcribe_file(file_path: Path, out: TextIO) -> None:
+    detector = RepetitionDetector()
+    # Whisper's memory use follows audio length, not file size, so chunk by duration
+    probe = probe_media(file_path)
+    if CHUNK_DURATION <= 0 or (probe and probe[0] <= CHUNK_DURATION):
+        transcribe_chunk(file_path, detector, out)
+        return
+    chunks = split_audio(file_path, CHUNK_DURATION)
+    if not chunks:
+        # A segmenter killed on shutdown returns nothing too; don't start a multi-hour unchunked decode
+        raise_if_stopping(file_path)
+        logging.warning(f"Transcribing {file_path} without chunking")
+        transcribe_chunk(file_path, detector, out)
+        return
     try:
-        logging.info(f"Executing Whisper command: {' '.join(whisper_cmd)}")
-        result = subprocess.run(whisper_cmd, capture_output=True, text=True, timeout=WHISPER_TIMEOUT)
-        if result.returncode == 0:
-            logging.info(f"Whisper transcription completed for {file_path}")
-            return result.stdout
-        else:
-            logging.error(f"Whisper transcription failed for {file_path}: {result.stderr}")
-            return ""
-    except subprocess.TimeoutExpired:
-        logging.error(f"Whisper transcription timed out for {file_path}")
-        return ""
+        for chunk in chunks:
+            transcribe_chunk(chunk, detector, out)
+    finally:
+        for chunk in chunks:
+            chunk.unlink(missing_ok=True)
+
+def write_transcript(file_path: Path, transcript_file: Path, header: str) -> None:
+    # Segments stream straight to disk instead of being joined in memory, and the final rename
+    # means a crash never leaves a partial .txt that the next scan would take as finished
+    tmp_file = transcript_file.with_name(f"{transcript_file.name}.tmp")
+    try:
+        with open(tmp_file, 'w', buffering=TRANSCRIPT_BUFFER_SIZE) as out:
+            out.write(header)
+            transcribe_file(file_path, out)
+        os.replace(tmp_file, transcript_file)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+
+def transcribe_with_retries(file_path: Path, transcript_file: Path, header: str) -> bool:
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            write_transcript(file_path, transcript_file, header)
+            return True
+        except (RepetitiveOutputError, TranscriptionStopped):
+            raise  # Decoding is deterministic and a stop is final; another attempt can't help
+        except Exception as e:
+            raise_if_stopping(file_path)  # Killed along with us, not a real failure
+            logging.error(f"Transcription attempt {attempt}/{MAX_RETRIES} failed for {file_path}: {str(e)}")
+            if attempt < MAX_RETRIES:
+                delay = RETRY_BACKOFF_BASE ** attempt
+                logging.info(f"Retrying {file_path} in {delay} seconds")
+                if STOP_EVENT.wait(delay):
+                    raise TranscriptionStopped(f"Stopped before retrying {file_path}")
+    return False
 
 def signal_handler(sig: int, frame) -> None:
     logging.info("Signal received, stopping...")
+    STOP_EVENT.set()
     sys.exit(0)
 
+def log_failure(file: Path, future) -> None:
+    if future.cancelled():
+        return  # Still queued at shutdown
+    try:
+        future.result()
+    except Exception as e:
+        logging.error(f"Processing failed for {file}: {str(e)}")
+
+class AdmissionGate:
+    # Running more Whisper/ffmpeg jobs than the cores can feed makes every job slower, so the
+    # number of files allowed to run is lowered while the load average stays too high
+    def __init__(self, max_permits: int):
+        self.max_permits = max_permits
+        self.permits = max_permits
+        self.active = 0
+        self.samples = deque(maxlen=ADMISSION_WINDOW)
+        self.condition = threading.Condition()
+
+    def __enter__(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.active < self.permits)
+            self.active += 1
+
+    def __exit__(self, *exc_info):
+        with self.condition:
+            self.active -= 1
+            self._adjust()
+            self.condition.notify_all()
+
+    def _adjust(self) -> None:
+        try:
+            load = os.getloadavg()[0] / (os.cpu_count() or 1)
+        except (AttributeError, OSError):
+            return  # No load average on Windows; keep the configured concurrency
+        self.samples.append(load)
+        mean_load = sum(self.samples) / len(self.samples)
+        if mean_load > ADMISSION_OVERLOAD and self.permits > 1:
+            self.permits -= 1
+            logging.info(f"Load {mean_load:.2f} per core, lowering concurrency to {self.permits}")
+        elif mean_load < ADMISSION_UNDERLOAD and self.permits < self.max_permits:
+            self.permits += 1
+            logging.info(f"Load {mean_load:.2f} per core, raising concurrency to {self.permits}")
+
+def flush_logs() -> None:
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
+def run_admitted(file: Path) -> None:
+    try:
+        with ADMISSION_GATE:
+            if not STOP_EVENT.is_set():
+                process_file(file)
+    finally:
+        flush_logs()  # A file's log lines reach disk when it finishes, even if the watcher then idles
+
+def submit_file(executor: ThreadPoolExecutor, file: Path) -> None:
+    future = executor.submit(run_admitted, file)
+    future.add_done_callback(partial(log_failure, file))
+
+def watch_directory(executor: ThreadPoolExecutor, monitor_dir: Path, file_queue: queue.Queue) -> None:
+    print(f"Watching {monitor_dir} for new media files...")
+    while True:
+        # A blocking get can't be interrupted by Ctrl+C on Windows, so wake up regularly
+        try:
+            file = file_queue.get(timeout=1)
+        except queue.Empty:
+            continue
+        submit_file(executor, file)
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
 def main() -> None:
+    global MAX_CONCURRENT_PROCESSES, CHUNK_DURATION, MAX_RETRIES, RETRY_FAILED, ADMISSION_GATE
     setup_logging()
     parser = argparse.ArgumentParser(description="AutoTranscribe Script")
     parser.add_argument('--recursive', action='store_true', help="Recursively process directories")
     parser.add_argument('--monitor_dir', type=str, default=None, help="Directory to monitor")
+    parser.add_argument('--watch', action='store_true', help="Keep running and transcribe new files as they appear")
+    parser.add_argument('--max_concurrent', type=positive_int, default=MAX_CONCURRENT_PROCESSES, help="Number of files transcribed in parallel")
+    parser.add_argument('--chunk_duration', type=int, default=CHUNK_DURATION, help="Chunk length in seconds for long recordings (0 disables chunking)")
+    parser.add_argument('--retries', type=positive_int, default=MAX_RETRIES, help="Total transcription attempts per file, including the first")
+    parser.add_argument('--retry_failed', action='store_true', help="Retry files that failed in an earlier run")
     args = parser.parse_args()
+    MAX_CONCURRENT_PROCESSES = args.max_concurrent
+    CHUNK_DURATION = args.chunk_duration
+    MAX_RETRIES = args.retries
+    RETRY_FAILED = args.retry_failed
+    ADMISSION_GATE = AdmissionGate(MAX_CONCURRENT_PROCESSES)
 
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
     monitor_dir = Path(args.monitor_dir) if args.monitor_dir else DEFAULT_MONITOR_DIR
-    pending_files = find_pending_files(recursive=args.recursive, monitor_dir=monitor_dir)
+    init_state_db()
+    load_probe_cache()
+    # Watch before the initial scan and model load, so files finished in the meantime are queued
+    # rather than missed; one seen both ways is skipped by its lock or transcript
+    file_queue = queue.Queue()
+    observer = start_observer(monitor_dir, args.recursive, file_queue) if args.watch else None
+    pending_files = find_pending_files(recursive=args.recursive, monitor_dir=monitor_dir,
+                                       retry_failed=args.retry_failed)
+    if pending_files:
+        pending_files = probe_pending_files(pending_files)
     display_queue(pending_files)
+    if pending_files or args.watch:
+        load_model()
 
-    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PROCESSES) as executor:
-        future_to_file = {executor.submit(process_file, file): file for file in pending_files}
-        for future in as_completed(future_to_file):
-            file = future_to_file[future]
-            try:
-                future.result()
-            except Exception as e:
-                logging.error(f"Processing failed for {file}: {str(e)}")
+    # Workers spend their time in ffmpeg subprocesses and CTranslate2 inference, which both run
+    # outside the GIL, so threads sharing the one loaded model give real parallelism
+    executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PROCESSES)
+    try:
+        for file in pending_files:
+            submit_file(executor, file)
+        if observer:
+            watch_directory(executor, monitor_dir, file_queue)
+        executor.shutdown(wait=True)
+    finally:
+        if observer:
+            observer.stop()
+            observer.join()
+        # After a signal, queued files are dropped instead of drained and running ones stop
+        # at their next segment, so shutdown doesn't wait for the whole backlog
+        executor.shutdown(wait=True, cancel_futures=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file